@@ -1,7 +1,7 @@
 import fio
 from datetime import datetime
 from decimal import Decimal
-from util import to_dict, currency_collection_to_string, penny_round, add_to_currency_collection
+from util import to_dict, currency_collection_to_string, penny_round, add_to_currency_collection, decimal_currency_collection
 from serialize_context import SerializeContext
 from borrow_fund import new_borrow_fund_from_dict
 from zoneinfo import ZoneInfo
@@ -10,10 +10,20 @@ from math import ceil
 
 daily_borrow_fund_contributions = {'usd': 20}
 
+# Borrow events with a rebuy price within this factor of the asset price are
+# not decayed and instead get ticked up every day.
+borrow_adjust_threshold = Decimal("1.05")
+
+# Daily fraction of the rebuy price that due borrow events are ticked up by.
+daily_borrow_adjust_rate = Decimal("0.0003")
+
 
 class Account:
     ''' Money, etc. related to the total trading account. '''
 
+    __slots__ = ("pf", "currencies", "daily_profit_counter", "profit_counter",
+        "borrow_fund", "last_checked")
+
     def __init__(self, pf, currencies, profit_counter, daily_profit_counter, 
             borrow_fund, last_checked=None):
         self.pf = pf
@@ -77,79 +87,71 @@ class Account:
     def apply_update(self, n_days: int):
         print(f"Applying {n_days} days of updates and costs")
 
-        # Account for option depreciation as a cost, reducing profit.
-        # We reduce option cost with option depreciation since the cost is
-        # already being accounted for by reducing profit.
+        # Check every option before applying anything so that a bad theta does
+        # not leave the update half applied.
+        options = [option for asset in self.pf.assets for option in asset.options]
+        if any(option.theta > 0 for option in options):
+            raise Exception("Theta should be negative")
+
         daily_depreciation = Decimal(0)
+        # Borrows below this threshold will not be decayed, later logic will
+        # actually increase them. As in the separate passes this loop
+        # replaced, it is taken from the last asset's price.
+        borrow_threshold = self.pf.assets[-1].price * borrow_adjust_threshold
+
+        decay_cost = Decimal(0)
+        borrow_adjust_cost = Decimal(0)
         for asset in self.pf.assets:
-            for option in asset.options:
-                if option.theta > 0:
-                    raise Exception("Theta should be negative")
 
-                option_decay_depreciation = option.theta * option.n_contracts * 100 
+            # Account for option depreciation as a cost, reducing profit.
+            # We reduce option cost with option depreciation since the cost is
+            # already being accounted for by reducing profit.
+            for option in asset.options:
+                option_decay_depreciation = option.theta * option.n_contracts * 100
                 daily_depreciation += option_decay_depreciation
                 option.buy_cost += penny_round(option_decay_depreciation * n_days)
-        self.add_profit(daily_depreciation * n_days)
-        print(f"Daily Option Depreciation: {daily_depreciation:.2f}")
 
-        # Account for share price decay, reducing profit.
-        # Borrows below threshold will not be decayed, later logic will actually
-        # increase them.
-        borrow_threshold = asset.price * Decimal(1.05)
-        decay_cost = Decimal(0)
-        for asset in self.pf.assets:
-            asset_decay_cost = asset.apply_decay(n_days, borrow_threshold=borrow_threshold)
-            decay_cost += asset_decay_cost
-        self.add_profit(-decay_cost)
-        print(f"Daily Decay Cost: {(decay_cost / n_days):.2f}")
+            # Account for share price decay, reducing profit.
+            decay_cost += asset.apply_decay(n_days, borrow_threshold=borrow_threshold)
 
-        # Contribute to the borrow fund.
-        for (currency_kind, amount) in daily_borrow_fund_contributions.items():
-            d_money = amount * n_days
-            self.borrow_fund.add_loan(-d_money, currency_kind)
-            self.add_profit(-d_money, currency_kind)
-
-        # Tick borrow prices up that are (or close to being) due.
-        borrow_adjust_cost = Decimal(0)
-        for asset in self.pf.assets:
+            # Tick borrow prices up that are (or close to being) due.
             for borrow_event in asset.borrow_events:
 
                 # Don't affect borrow events still far ahead in price.
                 if borrow_threshold < borrow_event.rebuy_at:
                     continue
 
-                share_price_change = penny_round(borrow_event.rebuy_at * Decimal(0.0003), fn=ceil)
+                share_price_change = penny_round(borrow_event.rebuy_at * daily_borrow_adjust_rate, fn=ceil)
                 borrow_event.rebuy_at += share_price_change * n_days
 
                 d_money = share_price_change * borrow_event.n_shares * n_days
                 borrow_adjust_cost += d_money
+
+        self.add_profit(daily_depreciation * n_days)
+        print(f"Daily Option Depreciation: {daily_depreciation:.2f}")
+
+        self.add_profit(-decay_cost)
+        print(f"Daily Decay Cost: {(decay_cost / n_days):.2f}")
+
+        # Contribute to the borrow fund.
+        for (currency_kind, amount) in daily_borrow_fund_contributions.items():
+            d_money = amount * n_days
+            self.borrow_fund.add_loan(-d_money, currency_kind)
+            self.add_profit(-d_money, currency_kind)
+
         self.add_profit(-borrow_adjust_cost)
         print(f"Borrow Adjust Cost: {borrow_adjust_cost / n_days:.2f}")
 
 
-def new_account_from_dict(dict, context: SerializeContext):
+def new_account_from_dict(d, context: SerializeContext):
     ''' With the given dict, creates an Account object. '''
 
-    raw_currencies = dict["currencies"]
-    currencies = {
-        symbol: Decimal(value) 
-        for (symbol, value) in raw_currencies.items()
-    }
-
-    raw_profit_counter = dict["profitCounter"]
-    profit_counter = {
-        symbol: Decimal(value) 
-        for (symbol, value) in raw_profit_counter.items()
-    }
-
-    raw_daily_profit_counter = dict["dailyProfitCounter"]
-    daily_profit_counter = {
-        symbol: Decimal(value) 
-        for (symbol, value) in raw_daily_profit_counter.items()
-    }
-
-    borrow_fund = new_borrow_fund_from_dict(dict['borrowFund'])
-    last_checked = datetime.fromisoformat(dict["lastChecked"])
+    currencies = decimal_currency_collection(d["currencies"])
+    profit_counter = decimal_currency_collection(d["profitCounter"])
+    daily_profit_counter = decimal_currency_collection(d["dailyProfitCounter"])
+
+    borrow_fund = new_borrow_fund_from_dict(d['borrowFund'])
+    last_checked = datetime.fromisoformat(d["lastChecked"])
 
     account = Account(context.pf, currencies, profit_counter, 
         daily_profit_counter, borrow_fund, last_checked=last_checked)
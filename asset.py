@@ -1,7 +1,11 @@
-from copy import deepcopy
+from bisect import bisect_right
+from collections import deque
 from decimal import Decimal
+from fractions import Fraction
 from math import ceil, floor
-from datetime import datetime, timedelta
+from operator import attrgetter, itemgetter
+from datetime import date, datetime, timedelta
+from itertools import repeat
 import pytz
 from util import to_dict, penny_round, currency_collection_get
 from typing import Optional
@@ -22,7 +26,27 @@ from profit_dest_override import ProfitDestOverride, new_profit_dest_override_fr
 
 # How many times higher in value the current price must be to be allowed to sell
 # a share.
-MIN_SELL_GAIN = Decimal(1.01)
+MIN_SELL_GAIN = Decimal("1.01")
+
+# Borrow events with a rebuy price below this many times the current price are
+# considered low and can be raised with profits.
+LOW_BORROW_GAIN = Decimal("1.05")
+
+# Portion of sale profits put towards raising low borrow events, and the
+# minimum amount contributed whenever there are any.
+BORROW_RAISE_PORTION = Decimal("0.2")
+MIN_BORROW_RAISE_CONTRIBUTION = Decimal(1)
+
+# Horizon urgency used when the horizon fund is short but not critically so.
+# Kept as an exact fraction so withheld share counts are computed in integers.
+LOW_HORIZON_URGENCY = Fraction(3, 20)
+
+# Set to re-sum borrow events after every borrow/unborrow and check them 
+# against the cached count. Off by default since it makes both O(events).
+CHECK_N_BORROWED = False
+
+# Timezone in which borrow event dates are recorded.
+NEW_YORK_TZ = pytz.timezone('America/New_York')
 
 # Index of segregated share account containing unbound shares.
 UNBOUND_SHARES = 0
@@ -44,11 +68,29 @@ PROMISE_SHARES = 4
 
 MANUAL_SHARES = 5
 
+# Printed in place of the shares of a target that has no assignment.
+EMPTY_SHARES_REPR = str(Shares())
+
+# Pulls the scalar fields of a serialized asset in a single call.
+ASSET_FIELDS = itemgetter("name", "order", "price", "currency", "shares",
+        "surplus", "baseChange", "weeklyCallGoalNContracts", 
+        "dailyDecayFactor", "marginRequirement", "borrowRaiseFund")
+
 
 class Asset:
     ''' An asset that can be divided into shares with a particular price at 
         a point in time. '''
 
+    __slots__ = ("p", "name", "order", "price", "currency_kind", "shares",
+        "base_change", "surplus", "stages", "cached_targets",
+        "cached_target_to_assignment", "_stage_by_kind", "borrow_events",
+        "_n_borrowed", "options", "write_options", "_option_by_security",
+        "_write_option_by_security",
+        "weekly_call_goal_n_contracts", "history", "profit_dest_overrides",
+        "_override_by_dest", "daily_decay_factor", "recommended_sell",
+        "recommended_buy", "option_pricing", "margin_requirement",
+        "borrow_raise_fund", "_min_sell_price", "all_targets_satisfied")
+
     def __init__(self, p, name=None, order=None, price=None, currency_kind=None,
             shares: Optional[SegregatedShares]=None, base_change = 0.0,
             margin_requirement = 0.0):
@@ -57,26 +99,46 @@ class Asset:
         self.order = order
         self.price = price
         self.currency_kind = currency_kind
+
+        # Highest buy price of shares that can be sold at the current price for
+        # at least MIN_SELL_GAIN. Set by fixup_price().
+        self._min_sell_price = None
+
         self.shares = shares or new_empty_segregated_shares(6)
         self.base_change = Decimal(base_change)
 
         self.surplus = Decimal(0)
         self.stages = []
         self.cached_targets = []
+
+        # Stages by kind, each found on first use. Reset when stages are 
+        # replaced.
+        self._stage_by_kind = {}
         self.cached_target_to_assignment = None
 
         self.borrow_events = []
 
+        # Total shares across borrow_events, kept in sync by borrow/unborrow.
+        self._n_borrowed = 0
+
         self.options = []
 
         self.write_options = []
         self.weekly_call_goal_n_contracts = 0
 
+        # Options and written options indexed by security_key, used to find an
+        # identical security to combine with.
+        self._option_by_security = {}
+        self._write_option_by_security = {}
+
         self.history = []
 
         # Override where profits should go instead of just going to the general 
         # profit account.
-        self.profit_dest_overrides = [] 
+        self.profit_dest_overrides = deque()
+
+        # The overrides above, indexed by destination.
+        self._override_by_dest = {}
 
         self.daily_decay_factor = None
 
@@ -114,7 +176,7 @@ class Asset:
             "weeklyCallGoalNContracts": self.weekly_call_goal_n_contracts,
             "dailyDecayFactor": self.daily_decay_factor,
             "baseChange": Decimal(self.base_change),
-            "profitDestOverrides": to_dict(self.profit_dest_overrides, context),
+            "profitDestOverrides": to_dict(list(self.profit_dest_overrides), context),
             "marginRequirement": self.margin_requirement,
             'borrowRaiseFund': self.borrow_raise_fund,
         }
@@ -128,9 +190,7 @@ class Asset:
         n_shares = len(self.shares)
         n_physical_shares = self.n_physical_shares()
 
-        option_value = Decimal(0)
-        for option in self.options:
-            option_value += option.value()
+        option_value = sum((option.value() for option in self.options), Decimal(0))
 
         money_value = Decimal(self.price * n_physical_shares) + option_value
         price = self.price
@@ -157,30 +217,25 @@ class Asset:
         if self.cached_target_to_assignment is None:
             self.distribute()
 
-        if verbose:
-            log_targets = reversed(self.cached_targets)
+        # Log from the highest target down. When not verbose, only the highest
+        # and the lowest three are shown.
+        targets = self.cached_targets
+        target_to_assignment = self.cached_target_to_assignment
+        if verbose or len(targets) <= 4:
+            logs = [write_target_log(target, target_to_assignment) 
+                    for target in reversed(targets)]
         else:
-            log_targets = []
-            if len(self.cached_targets) > 0:
-                log_targets.append(self.cached_targets[-1])
-            if len(self.cached_targets) > 4:
-                log_targets.append("...\n")
-                log_targets += reversed(self.cached_targets[0:3])
-            else:
-                log_targets += reversed(self.cached_targets[0:len(self.cached_targets)-1])
-
-        borrow_str = "["
-        for (i, event) in enumerate(self.borrow_events):
-            borrow_str += f"${event.rebuy_at:.2f} (${event.price:.2f}) x {event.n_shares} [${event.cost:.2f}]"
-            if i < len(self.borrow_events) - 1:
-                borrow_str += ", "
-        borrow_str += "]" 
-
-        summary = ""
-        #print(list(log_targets))
-        for target in log_targets:
-            log = write_target_log(target, self.cached_target_to_assignment)
-            summary += f"{log}\n"
+            logs = [write_target_log(target, target_to_assignment) 
+                    for target in (targets[-1], targets[2], targets[1], 
+                    targets[0])]
+            logs.insert(1, "...")
+
+        borrow_str = ", ".join(
+            f"${event.rebuy_at:.2f} (${event.price:.2f}) x {event.n_shares} [${event.cost:.2f}]"
+            for event in self.borrow_events)
+        borrow_str = f"[{borrow_str}]"
+
+        summary = "".join(f"{log}\n" for log in logs)
         summary += f"Unbound shares: {self.shares[UNBOUND_SHARES]}\n"
         summary += f"Horizon shares: {self.shares[HORIZON_SHARES]}\n"
         summary += f"Borrows: {borrow_str}\n"
@@ -195,14 +250,20 @@ class Asset:
     def distribute(self, all_shares=None) -> DistributionReport:
         ''' Distribute shares among the current targets. This recomputes which
             shares are bound versus unbound as well as creating the assignments
-            of bound shares to targets. '''
+            of bound shares to targets. 
+            
+            all_shares, if given, is taken over as the new bound group, so
+            callers must pass a Shares they do not otherwise use.
+        '''
 
+        groups = self.shares.groups
         if all_shares is None:
-            all_shares = self.shares[UNBOUND_SHARES] + self.shares[BOUND_SHARES]
+            all_shares = groups[UNBOUND_SHARES] + groups[BOUND_SHARES]
         report = distribute(all_shares, self.cached_targets, self.price, 
                 MIN_SELL_GAIN)
-        self.shares[UNBOUND_SHARES] = report.unbound_shares
-        self.shares[BOUND_SHARES] = all_shares - report.unbound_shares
+        groups[UNBOUND_SHARES] = report.unbound_shares
+        all_shares -= report.unbound_shares
+        groups[BOUND_SHARES] = all_shares
         self.cached_target_to_assignment = report.target_to_assignment
         return report
 
@@ -210,7 +271,7 @@ class Asset:
         targets = []
         for stage in self.stages:
             targets += stage.generate_targets()
-        targets = sorted(targets, key=lambda t: t.sell_price)
+        targets.sort(key=attrgetter("sell_price"))
         self.cached_targets = targets
         return targets
 
@@ -229,10 +290,11 @@ class Asset:
         # Identify the shares held by targets that will be sold. Later on, we
         # will hold these out so that they aren't considered for filling other 
         # targets.
+        # Targets are sorted by sell price, so the reached ones are a prefix.
+        n_reached = bisect_right(self.cached_targets, self.price, 
+                key=attrgetter("sell_price"))
         sold_shares = Shares()
-        for target in self.cached_targets:
-            if self.price < target.sell_price:
-                break
+        for target in self.cached_targets[:n_reached]:
             assignment = self.cached_target_to_assignment.get(target, None)
             if assignment is not None:
                 sold_shares += assignment.shares
@@ -242,20 +304,21 @@ class Asset:
             stage.on_update(self.price, MIN_SELL_GAIN)
         targets = self.regenerate_targets()
 
-        # Try to fund horizon targets.
-        horizon_targets = filter(lambda t: t.horizon_request_id is not None, targets)
+        # Try to fund horizon targets. Groups are looked up through this list
+        # since distribute() replaces the unbound and bound groups.
+        groups = self.shares.groups
+        horizon_targets = [t for t in targets if t.horizon_request_id is not None]
         for target in horizon_targets:
 
             # Release as many shares from the horizon as it would take to
             # fund this target.
-            eligible_shares = self.shares[HORIZON_SHARES].as_split([target.max_buy_price])[0]
+            eligible_shares = groups[HORIZON_SHARES].below(target.max_buy_price)
             to_take, profit = eligible_shares.top_profit(target.profit, target.sell_price,
                     target.min_buy_price, MIN_SELL_GAIN)
             if profit < target.profit:
                 print(f"Unable to fully fund target with horizon fund:\n  {target}.")
 
-            self.shares[HORIZON_SHARES] -= to_take
-            self.shares[UNBOUND_SHARES] += to_take
+            self.shares.transfer(HORIZON_SHARES, UNBOUND_SHARES, to_take)
 
             for stage in self.stages:
                 stage.on_horizon_filled(target.horizon_request_id)
@@ -263,9 +326,10 @@ class Asset:
         # Distribute shares and come up with recommendations. Shares that will
         # be sold for any targets reached are temporarily excluded during 
         # distribution but must be returned after.
-        to_distribute = self.shares[UNBOUND_SHARES] + self.shares[BOUND_SHARES] - sold_shares
+        to_distribute = groups[UNBOUND_SHARES] + groups[BOUND_SHARES]
+        to_distribute -= sold_shares
         report = self.distribute(to_distribute)
-        self.shares[UNBOUND_SHARES] += sold_shares
+        groups[UNBOUND_SHARES] += sold_shares
 
         self.recommended_buy = None
         self.recommended_sell = None
@@ -273,15 +337,15 @@ class Asset:
         if report.buys_needed is not None and 0 < report.buys_needed:
             self.recommended_buy = report.buys_needed
             self.recommended_sell = sold_shares
-        if 0 < len(self.shares[UNBOUND_SHARES]):
+        if 0 < len(groups[UNBOUND_SHARES]):
 
             # Sell unbound shares sufficiently below price.
-            unbound_to_sell = report.unbound_shares.as_split([self.price / MIN_SELL_GAIN])[0]
+            unbound_to_sell = report.unbound_shares.below(self._min_sell_price)
             self.recommended_sell = unbound_to_sell + sold_shares
 
         return self.recommended_sell, self.recommended_buy
 
-    def horizon_urgency(self) -> float:
+    def horizon_urgency(self) -> Fraction:
         ''' A score from 0->1 of how urgent it is to fill the horizon fund. '''
 
         # This is the minimum number of horizon shares and the amount considered
@@ -291,12 +355,13 @@ class Asset:
 
         # Urgency to fill up the horizon fund in any form at all in case new
         # targets at the horizon will be created.
-        if len(self.shares[HORIZON_SHARES]) < horizon_minimum:
-            return 1.0
+        n_horizon_shares = len(self.shares[HORIZON_SHARES])
+        if n_horizon_shares < horizon_minimum:
+            return Fraction(1)
         
         col_urgency = self.collateral_urgency(horizon_minimum)
-        horizon_urgency = 0.15 if len(self.shares[HORIZON_SHARES]) < horizon_good else 0
-        print(col_urgency, horizon_urgency)
+        horizon_urgency = LOW_HORIZON_URGENCY if n_horizon_shares < horizon_good else Fraction(0)
+        print(f"{float(col_urgency):g} {float(horizon_urgency):g}")
         return max(col_urgency, horizon_urgency)
 
     def collateral_urgency(self, horizon_minimum):
@@ -304,7 +369,7 @@ class Asset:
             collateral alone. '''
         
         # Skip this stuff for now.
-        return 0
+        return Fraction(0)
 
         # How close we are to fulfilling the weekly goal.
         contracts_written = 0
@@ -313,7 +378,7 @@ class Asset:
         next_sunday = (today + timedelta(days=days_until_sunday)).date()
         next_next_sunday = (next_sunday + timedelta(days=7))
         for option in self.write_options:
-            option_date = datetime.strptime(option.date, "%Y-%m-%d").date()
+            option_date = date.fromisoformat(option.date)
             if next_sunday < option_date and option_date < next_next_sunday:
                 contracts_written += option.n_contracts
 
@@ -322,26 +387,25 @@ class Asset:
 
         # The remaining urgency is for having shares ready for collateral for 
         # call options. First off, we don't worry about this until Wednesday.
-        week_day = datetime.now().weekday()
+        week_day = today.weekday()
         if week_day <= 2:
-            return 0
+            return Fraction(0)
 
         # Compute how many shares are already ready for use as collateral.
         horizon_ready_shares = self.shares[HORIZON_SHARES].top(horizon_minimum)
         remaining_horizon_shares = self.shares[HORIZON_SHARES] - horizon_ready_shares
         horizon_price = ceil(float(self.price) * 1.02)
-        collateral_ready_shares = remaining_horizon_shares.as_split([horizon_price])[0]
-        n_collateral_shares = len(collateral_ready_shares)
+        n_collateral_shares = remaining_horizon_shares.n_below(horizon_price)
         
         # No urgency if already satisfied.
         if contracts_needed * 100 <= n_collateral_shares:
-            return 0
+            return Fraction(0)
 
         # Highly urgent on Friday.
         if week_day >= 4:
-            return 1
+            return Fraction(1)
         else:
-            return 0.15
+            return LOW_HORIZON_URGENCY
 
     def u(self, auto_sell=False):
         ''' Quick alias for update(). '''
@@ -376,10 +440,9 @@ class Asset:
             if hold_horizon and 0 < hold_ratio:
 
                 if self.recommended_sell is not None and 0 < len(self.recommended_sell):
-                    n_withheld = int(ceil(len(self.recommended_sell) * hold_ratio))
+                    n_withheld = ceil(len(self.recommended_sell) * hold_ratio)
                     withheld = self.recommended_sell.top(n_withheld)
-                    self.shares[HORIZON_SHARES] += withheld
-                    self.shares[UNBOUND_SHARES] -= withheld
+                    self.shares.transfer(UNBOUND_SHARES, HORIZON_SHARES, withheld)
                     self.recommended_sell -= withheld
                 elif self.recommended_buy is not None and hold_ratio >= 0.5:
                     n_horizon_buy = int(self.recommended_buy * hold_ratio)
@@ -448,28 +511,31 @@ class Asset:
         if n is None:
             raise Exception("Not supported quite yet.")
 
+        price = self.price
+        currency_kind = self.currency_kind
+        account = self.p.account
+        overrides = self.profit_dest_overrides
+
         if enable_min_profit:
-            min_sell_price = self.price / MIN_SELL_GAIN
+            min_sell_price = self._min_sell_price
         else:
-            min_sell_price = self.price
+            min_sell_price = price
 
         # In computing to_sell: first gets all unbound shares below the minimum
         # allowed sell price; then takes the top n of those.
         unbound = self.shares.groups[UNBOUND_SHARES]
-        sellable = unbound.as_split([min_sell_price])[0]
-        n_actual_sell = n if not prevent_oversell else min(n, len(sellable))
-        to_sell = sellable.top(n_actual_sell)
+        to_sell = unbound.top_below(min_sell_price, n, clamp=prevent_oversell)
 
         if do_checkpoint:
             self.p.checkpoint()
 
-        unbound.set(unbound - to_sell)
-        self.p.account.currencies[self.currency_kind] += len(to_sell) * self.price
+        unbound -= to_sell
+        account.currencies[currency_kind] += len(to_sell) * price
 
         # Distribute profit to any overrides first.
-        remaining_profit = to_sell.compute_profit(self.price)
-        while remaining_profit > 0 and len(self.profit_dest_overrides) > 0:
-            o = self.profit_dest_overrides[0]
+        remaining_profit = to_sell.compute_profit(price)
+        while remaining_profit > 0 and len(overrides) > 0:
+            o = overrides[0]
 
             take = min(o.value, remaining_profit)
             o.dest.add_overridden_profit(take)
@@ -477,14 +543,16 @@ class Asset:
 
             o.value -= take
             if o.value < 0.01:
-                self.profit_dest_overrides.pop(0)
+                overrides.popleft()
+                del self._override_by_dest[o.dest]
 
         # Distribute a portion of remaining profit for raising back up borrow
         # events.
         n_borrows, borrow_events = self.find_low_borrows()
 
         if 0 < n_borrows:
-            contribution = penny_round(Decimal(max(1.0, 0.2 * float(remaining_profit))))
+            contribution = penny_round(max(MIN_BORROW_RAISE_CONTRIBUTION, 
+                BORROW_RAISE_PORTION * remaining_profit))
             remaining_profit -= contribution
             self.borrow_raise_fund += contribution
             self.payout_borrow_raise_fund(n_borrows, self.borrow_events)
@@ -492,16 +560,17 @@ class Asset:
 
         # Distribute a portion of remaining profit as tax if below the tax 
         # threshold.
-        if self.p.account.borrow_fund.is_taxed(self.currency_kind):
-            contribution = Decimal(income_tax_rate * float(remaining_profit))
+        borrow_fund = account.borrow_fund
+        if borrow_fund.is_taxed(currency_kind):
+            contribution = income_tax_rate * remaining_profit
             remaining_profit -= contribution
-            self.p.account.borrow_fund.add_loan(-contribution, self.currency_kind)
+            borrow_fund.add_loan(-contribution, currency_kind)
 
         # Distribute a portion to stages.
         for stage in self.stages:
             remaining_profit = stage.tax_profits(remaining_profit)
 
-        self.p.add_profit(remaining_profit, currency=self.currency_kind)
+        self.p.add_profit(remaining_profit, currency=currency_kind)
 
         self.history.append(HistoryItem(datetime.now(), f"Sold {to_sell}", len(self)))
 
@@ -510,8 +579,9 @@ class Asset:
     def find_low_borrows(self):
         n_borrows = 0
         borrow_events = []
+        low_price = self.price * LOW_BORROW_GAIN
         for borrow_event in self.borrow_events:
-            if borrow_event.rebuy_at < self.price * Decimal(1.05):
+            if borrow_event.rebuy_at < low_price:
                 n_borrows += borrow_event.n_shares
                 borrow_events.append(borrow_event)
         return n_borrows, borrow_events
@@ -524,7 +594,7 @@ class Asset:
         if cents_per_share == 0:
             return
 
-        dollars_per_share = Decimal(cents_per_share / 100.0)
+        dollars_per_share = Decimal(cents_per_share) / 100
         for borrow_event in borrow_events:
             borrow_event.rebuy_at += dollars_per_share
         self.borrow_raise_fund -= dollars_per_share * n_borrows
@@ -540,17 +610,15 @@ class Asset:
         self.p.account.currencies[self.currency_kind] -= n_contracts * 100 * price
 
         # Check if an identical option exists to combine with.
-        identical_found = False
-        for other_option in self.write_options:
-            if other_option.is_identical_security(option):
-                other_option.combine(option)
-                option = other_option
-                option.price = price
-                identical_found = True
-                break
-
-        if not identical_found:
+        key = security_key(option)
+        other_option = self._write_option_by_security.get(key, None)
+        if other_option is not None:
+            other_option.combine(option)
+            option = other_option
+            option.price = price
+        else:
             self.write_options.append(option)
+            self._write_option_by_security[key] = option
 
         return option
 
@@ -571,17 +639,15 @@ class Asset:
             self.p.account.borrow_fund.add_income(-n_contracts * 100 * price, self.currency_kind)
 
         # Check if an identical option exists to combine with.
-        identical_found = False
-        for other_option in self.options:
-            if other_option.is_identical_security(option):
-                other_option.combine(option)
-                option = other_option
-                option.price = price
-                identical_found = True
-                break
-        
-        if not identical_found:
+        key = security_key(option)
+        other_option = self._option_by_security.get(key, None)
+        if other_option is not None:
+            other_option.combine(option)
+            option = other_option
+            option.price = price
+        else:
             self.options.append(option)
+            self._option_by_security[key] = option
 
         return option
 
@@ -598,7 +664,7 @@ class Asset:
         self.p.add_borrow_funding(sell_profit, currency=self.currency_kind)
         
         if o.n_contracts == 0:
-            self.options.remove(o)
+            self.remove_option(o)
 
             option_stage = self.find_stage("option")
             option_stage.on_option_sold(o)
@@ -634,35 +700,46 @@ class Asset:
             self.p.add_profit(sell_profit, currency=self.currency_kind)
 
         if o.n_contracts == 0:
-            self.options.remove(o)
+            self.remove_option(o)
 
             option_stage = self.find_stage("custom")
             option_stage.on_option_sold(o)
 
         # Check if an identical option exists to combine with.
-        identical_found = False
-        for other_option in self.options:
-            if other_option.is_identical_security(new_option):
-                other_option.combine(new_option)
-                new_option = other_option
-                new_option.price = price
-                identical_found = True
-                break
-        
-        if not identical_found:
+        key = security_key(new_option)
+        other_option = self._option_by_security.get(key, None)
+        if other_option is not None:
+            other_option.combine(new_option)
+            new_option = other_option
+            new_option.price = price
+        else:
             self.options.append(new_option)
+            self._option_by_security[key] = new_option
 
         self.p.account.currencies[self.currency_kind] += n_contracts * 100 * o.price
         self.p.account.currencies[self.currency_kind] -= n_contracts * 100 * new_option.price
         return o, new_option
 
+    def remove_option(self, o):
+        ''' Removes a fully sold option from this asset. '''
+
+        self.options.remove(o)
+        key = security_key(o)
+        if self._option_by_security.get(key, None) is o:
+            del self._option_by_security[key]
+
     def n_borrowed(self) -> int:
         ''' Get number of shares being borrowed. '''
 
-        n_borrows = 0
-        for borrow_event in self.borrow_events:
-            n_borrows += borrow_event.n_shares
-        return n_borrows
+        return self._n_borrowed
+
+    def check_n_borrowed(self):
+        ''' Checks that the cached borrow count matches the borrow events. '''
+
+        expected = sum(e.n_shares for e in self.borrow_events)
+        if self._n_borrowed != expected:
+            raise Exception(f"cached n_borrowed {self._n_borrowed} does not "
+                    f"match borrow events ({expected})")
 
     def borrow(self, n, rebuy_percent=None, cost=None):
         ''' Borrow n shares at the current price. Physically selling them 
@@ -683,10 +760,12 @@ class Asset:
             cost = (rebuy_at - self.price) * n
 
         now = datetime.now()
-        tz = pytz.timezone('America/New_York')
-        date = tz.localize(now).date()
+        date = NEW_YORK_TZ.localize(now).date()
 
         self.borrow_events.append(BorrowEvent(self.price, n, date, cost, rebuy_at))
+        self._n_borrowed += n
+        if CHECK_N_BORROWED:
+            self.check_n_borrowed()
         self.p.account.currencies[self.currency_kind] += self.price * n
 
         if 0 < cost:
@@ -705,6 +784,9 @@ class Asset:
         else:
             borrow_event.n_shares -= n
             borrow_event.cost -= borrow_event.cost * Decimal(n) / Decimal(old_n_shares) 
+        self._n_borrowed -= n
+        if CHECK_N_BORROWED:
+            self.check_n_borrowed()
 
         rebuy_price_advantage = n * (borrow_event.price - self.price)
         self.p.account.borrow_fund.add_loan(
@@ -716,43 +798,40 @@ class Asset:
 
     def unbind_all(self, exclude_horizon=True):
         ''' Unbind all shares. '''
-        shares = self.shares[UNBOUND_SHARES] + self.shares[BOUND_SHARES]
+        groups = self.shares.groups
+        shares = groups[UNBOUND_SHARES] + groups[BOUND_SHARES]
         if not exclude_horizon:
-            shares += self.shares[HORIZON_SHARES]
+            shares += groups[HORIZON_SHARES]
 
-        self.shares[BOUND_SHARES] = Shares([])
+        groups[BOUND_SHARES] = Shares([])
         if not exclude_horizon:
-            self.shares[HORIZON_SHARES] = Shares([])
+            groups[HORIZON_SHARES] = Shares([])
 
-        self.shares[UNBOUND_SHARES] = shares
+        groups[UNBOUND_SHARES] = shares
 
     def unbound_to_horizon(self, n_shares):
         ''' Move the n most expensive unbound shares to horizon. '''
 
-        top_n = self.shares[0].top(n_shares)
-        self.shares[0] -= top_n
-        self.shares[2] += top_n
+        top_n = self.shares[UNBOUND_SHARES].top(n_shares)
+        self.shares.transfer(UNBOUND_SHARES, HORIZON_SHARES, top_n)
 
     def horizon_to_unbound(self, n_shares):
         ''' Move the n least expensive horizon shares to unbound. '''
 
-        bottom_n = self.shares[2].bottom(n_shares)
-        self.shares[2] -= bottom_n
-        self.shares[0] += bottom_n
+        bottom_n = self.shares[HORIZON_SHARES].bottom(n_shares)
+        self.shares.transfer(HORIZON_SHARES, UNBOUND_SHARES, bottom_n)
 
     def move_top(self, n_shares, i0, i1):
         ''' Move the top n_shares from group i0 to i1'''
 
         top_n = self.shares[i0].top(n_shares)
-        self.shares[i0] -= top_n
-        self.shares[i1] += top_n
+        self.shares.transfer(i0, i1, top_n)
         
     def move_bottom(self, n_shares, i0, i1):
         ''' Move the bottom n_shares from group i0 to i1'''
 
         bottom_n = self.shares[i0].bottom(n_shares)
-        self.shares[i0] -= bottom_n
-        self.shares[i1] += bottom_n
+        self.shares.transfer(i0, i1, bottom_n)
 
     def get_highest_ready_price(self) -> Decimal:
         ''' Gets the highest supported price where on things like Ladders, any 
@@ -798,12 +877,15 @@ class Asset:
         return self.p.account.currencies[self.currency_kind]
 
     def fixup_price(self):
-        ''' Fixes up the price to be a proper Decimal. '''
+        ''' Fixes up the price to be a proper Decimal. Also refreshes the
+            minimum sell price derived from it. '''
         self.price = Decimal(penny_round(self.price))
+        self._min_sell_price = self.price / MIN_SELL_GAIN
 
     def get_decay_fn(self, n_days):
-        decay = lambda x, f, t: x * (1 - f) ** t
-        decay_fn = lambda x: decay(x, self.daily_decay_factor, n_days)
+        # The power is the same for every price, so take it once.
+        factor = (1 - self.daily_decay_factor) ** n_days
+        decay_fn = lambda x: x * factor
         return decay_fn
 
     def apply_decay(self, n_days=None, borrow_threshold=None):
@@ -815,6 +897,10 @@ class Asset:
         
         if self.daily_decay_factor is None:
             return
+
+        # Nothing decays over zero days or at a zero daily rate.
+        if n_days == 0 or self.daily_decay_factor == 0:
+            return Decimal(0)
         
         decay_fn = self.get_decay_fn(n_days)
 
@@ -822,16 +908,16 @@ class Asset:
             stage.apply_decay_fn(decay_fn)
 
         decay_cost = Decimal(0)
-        for (i, old_shares) in enumerate(self.shares):
-            new_shares = Shares()
-            for pair in old_shares.pairs:
-                old_price = pair[0]
-                n_shares = pair[1]
-                new_price = penny_round(decay_fn(pair[0]))
-                new_shares += [new_price, n_shares]
-                decay_cost += (old_price - new_price) * n_shares
-
-            self.shares[i] = new_shares
+        for shares in self.shares.groups:
+
+            # Refill the group in place. Decay keeps prices in order, so pairs
+            # can be appended, merging any that land on the same price.
+            old_pairs = shares.pairs
+            old_cost = shares.total_buy_cost()
+            shares.pairs = []
+            for (price, qty) in old_pairs:
+                shares.append_pair(decay_fn(price), qty)
+            decay_cost += old_cost - shares.total_buy_cost()
         
         borrow_decay = Decimal(0)
         for (i, e) in enumerate(self.borrow_events):
@@ -863,10 +949,10 @@ class Asset:
         if max_buy_price is not None:
             max_buy_price = Decimal(max_buy_price)
         else:
-            max_buy_price = Decimal(float(sell_price) / 1.01) 
+            max_buy_price = sell_price / MIN_SELL_GAIN
 
         if min_buy_price is not None:
-            min_buy_price = Decimal(max_buy_price)
+            min_buy_price = Decimal(min_buy_price)
         else:
             min_buy_price = self.price 
 
@@ -881,8 +967,13 @@ class Asset:
         ''' Find the first stage of the given kind or return None if it does
             not exist. '''
 
+        stage = self._stage_by_kind.get(kind, None)
+        if stage is not None:
+            return stage
+
         for stage in self.stages:
-            if stage.get_stage_kind() == kind:
+            if stage.stage_kind == kind:
+                self._stage_by_kind[kind] = stage
                 return stage
 
         return None
@@ -892,74 +983,99 @@ class Asset:
             general profit account. '''
         
         # Combine any matching existing override.
-        for o in self.profit_dest_overrides:
-            if dest == o.dest:
-                o.value += value
-                return
+        o = self._override_by_dest.get(dest, None)
+        if o is not None:
+            o.value += value
+            return
         
-        self.profit_dest_overrides.append(ProfitDestOverride(dest, value))
+        o = ProfitDestOverride(dest, value)
+        self.profit_dest_overrides.append(o)
+        self._override_by_dest[dest] = o
 
-    def replace_from_dict(self, dict, context: SerializeContext):
+    def replace_from_dict(self, d, context: SerializeContext):
         context.asset = self
 
-        name = dict["name"]
-        order = dict["order"]
-        price = dict["price"]
-        currency_kind = dict["currency"]
-        shares = new_segregated_shares_from_dict(dict["shares"])
-        surplus = dict["surplus"]
-        base_change = Decimal(dict["baseChange"])
+        (name, order, price, currency_kind, shares, surplus, base_change,
+                weekly_call_goal_n_contracts, daily_decay_factor, 
+                margin_requirement, borrow_raise_fund) = ASSET_FIELDS(d)
 
         self.name = name
         self.order = order
         self.price = Decimal(price)
         self.currency_kind = currency_kind
-        self.shares = shares
+        self.shares = new_segregated_shares_from_dict(shares)
         self.surplus = surplus
-        self.weekly_call_goal_n_contracts = dict["weeklyCallGoalNContracts"]
-        self.options = [new_option_from_dict(d, context) for d in dict['options']]
-        self.write_options = [new_write_option_from_dict(d, context) for d in dict['writeOptions']]
-        self.cached_targets = [new_target_from_dict(t, context) for t in dict["cachedTargets"]]
-        self.stages = [new_stage_from_dict(s, context) for s in dict["stages"]]
-        self.borrow_events = [new_borrow_event_from_dict(e) for e in dict["borrowEvents"]]
-        self.history = [new_history_item_from_dict(d, context) for d in dict['history']]
-        self.profit_dest_overrides = [new_profit_dest_override_from_dict(d, context) for d in dict['profitDestOverrides']]
-        self.base_change = base_change
+        self.weekly_call_goal_n_contracts = weekly_call_goal_n_contracts
+        contexts = repeat(context)
+        self.options = list(map(new_option_from_dict, d['options'], contexts))
+        self.write_options = list(map(new_write_option_from_dict, d['writeOptions'], contexts))
+        self._option_by_security = index_by_security(self.options)
+        self._write_option_by_security = index_by_security(self.write_options)
+        self.cached_targets = list(map(new_target_from_dict, d["cachedTargets"], contexts))
+        self.stages = list(map(new_stage_from_dict, d["stages"], contexts))
+        self._stage_by_kind = {}
+        self.borrow_events = list(map(new_borrow_event_from_dict, d["borrowEvents"]))
+        self._n_borrowed = sum(e.n_shares for e in self.borrow_events)
+        self.history = list(map(new_history_item_from_dict, d['history'], contexts))
+        self.profit_dest_overrides = deque(map(new_profit_dest_override_from_dict, d['profitDestOverrides'], contexts))
+        self._override_by_dest = {o.dest: o for o in self.profit_dest_overrides}
+        self.base_change = Decimal(base_change)
 
-        self.daily_decay_factor = Decimal(dict["dailyDecayFactor"])
+        self.daily_decay_factor = Decimal(daily_decay_factor)
 
-        self.margin_requirement = Decimal(dict["marginRequirement"])
-        self.borrow_raise_fund = Decimal(dict["borrowRaiseFund"])
+        self.margin_requirement = Decimal(margin_requirement)
+        self.borrow_raise_fund = Decimal(borrow_raise_fund)
 
         context.asset = None
 
 
-def new_asset_from_dict(dict, portfolio, context: SerializeContext) -> Asset:
+def security_key(option):
+    ''' Key under which options count as identical securities. All options of
+        an asset share the same asset, so only these fields matter. '''
+
+    return (option.mode, option.date, option.strike_price)
+
+
+def index_by_security(options):
+    ''' Indexes options by security_key, keeping the first of any duplicates 
+        as the combine loops did. '''
+
+    index = {}
+    for option in options:
+        index.setdefault(security_key(option), option)
+    return index
+
+
+def new_asset_from_dict(d, portfolio, context: SerializeContext) -> Asset:
     ''' Creates a new asset from the given dictionary. '''
 
     asset = Asset(portfolio)
-    asset.replace_from_dict(dict, context)
+    asset.replace_from_dict(d, context)
     return asset
 
 
 def write_target_log(target, target_to_assignment) -> str:
-    if isinstance(target, str):
-        return "..."
-
     if target_to_assignment is not None:
         assignment = target_to_assignment.get(target, None)
     else:
         assignment = None
     if assignment is None:
         assignment_profit = 0
-        assignment_shares = Shares()
+        assignment_shares = EMPTY_SHARES_REPR
     else:
         assignment_profit = assignment.profit
         assignment_shares = assignment.shares
-    log = (f"${target.sell_price:.2f} ({target.name}) - Profit: " + 
-            f"{assignment_profit:.2f}/{target.profit:.2f}; " +
-            f"Max: {penny_round(target.max_buy_price):.2f}; " +
-            f"Min: {penny_round(target.min_buy_price):.2f}; " +
+
+    # Format through float; Decimal.__format__ is much slower.
+    sell_price = float(target.sell_price)
+    assignment_profit = float(assignment_profit)
+    profit = float(target.profit)
+    max_buy_price = float(target.max_buy_price)
+    min_buy_price = float(target.min_buy_price)
+    log = (f"${sell_price:.2f} ({target.name}) - Profit: " + 
+            f"{assignment_profit:.2f}/{profit:.2f}; " +
+            f"Max: {max_buy_price:.2f}; " +
+            f"Min: {min_buy_price:.2f}; " +
             f"Shares: {assignment_shares}")
     return log
 
@@ -11,10 +11,10 @@ class Assignment:
         self.profit = profit
 
 
-def new_assignment_from_dict(dict, context: SerializeContext) -> Assignment:
+def new_assignment_from_dict(d, context: SerializeContext) -> Assignment:
     ''' Creates a new assignment from the given dict. '''
 
-    target = context.id_to_value[dict["targetID"]]
-    shares = new_shares_from_dict(dict)
+    target = context.id_to_value[d["targetID"]]
+    shares = new_shares_from_dict(d)
     profit = context.id_to_value["profit"]
     return Assignment(target, shares, profit)
\ No newline at end of file
@@ -11,6 +11,8 @@ class BorrowEvent:
         to repay that loan.
     '''
 
+    __slots__ = ("price", "n_shares", "date", "cost", "rebuy_at")
+
     def __init__(self, price, n_shares, date, cost, rebuy_at):
         self.price = Decimal(price)
         self.n_shares = n_shares
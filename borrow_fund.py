@@ -1,14 +1,18 @@
 from datetime import datetime
 from decimal import Decimal
 from serialize_context import SerializeContext
-from util import currency_collection_to_string, subtract_currency_collections, add_to_currency_collection, get_currency_from_collection
+from util import currency_collection_to_string, subtract_currency_collections, add_to_currency_collection, get_currency_from_collection, decimal_currency_collection
 
 
 # When amount owing exceeds this, tax trading profits.
 tax_threshold = {'usd': -2000}
 
 # If income fund is below tax threshold, trading profits are taxed at this rate.
-income_tax_rate = 0.25
+income_tax_rate = Decimal("0.25")
+
+# Promised shares are expected to sell for this much more than they cost, and
+# that expected profit counts toward covering the loan balance.
+promise_profit_ratio = Decimal("0.2")
 
 
 class BorrowFund:
@@ -26,13 +30,8 @@ class BorrowFund:
 
         self.promised_share_balance = {}
         for asset in self.account.pf.assets:
-            profit = Decimal(0)
             promise_shares = asset.shares[PROMISE_SHARES]
-            for pair in promise_shares.pairs:
-                per_profit = pair[0] * Decimal(1.2) - pair[0]
-                qty = pair[1]
-                profit += per_profit * qty
-
+            profit = promise_shares.total_buy_cost() * promise_profit_ratio
             add_to_currency_collection(self.promised_share_balance, profit, 
                     asset.currency_kind)        
 
@@ -71,16 +70,8 @@ class BorrowFund:
 
 
 def new_borrow_fund_from_dict(dictionary) -> BorrowFund:
-    raw_loan_balance = dictionary["loanBalance"]
-    raw_promised_share_balance = dictionary["promisedShareBalance"]
-    loan_balance = {
-        symbol: Decimal(value) 
-        for (symbol, value) in raw_loan_balance.items()
-    }
-    promised_share_balance = {
-        symbol: Decimal(value) 
-        for (symbol, value) in raw_promised_share_balance.items()
-    }
+    loan_balance = decimal_currency_collection(dictionary["loanBalance"])
+    promised_share_balance = decimal_currency_collection(dictionary["promisedShareBalance"])
     return BorrowFund(
         None, 
             loan_balance=loan_balance, 
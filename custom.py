@@ -6,17 +6,16 @@ from util import to_dict
 
 class Custom(StageBase):
     '''  A stage where targets can be manually created. '''
-    pass
+
+    __slots__ = ("targets",)
 
     def __init__(self, targets=None):
+        super().__init__("custom")
         if targets is None:
             self.targets = []
         else:
             self.targets = targets
 
-    def get_stage_kind(self) -> str:
-        return "custom"
-    
     def new_target(self, sell_price: Decimal, name: str, profit: Decimal, 
             max_buy_price: Decimal, min_buy_price: Decimal):
         ''' Adds a new target to this.
@@ -112,7 +112,7 @@ def distribute_pass(shares: Shares, targets: List[Target], current_price: Decima
                 break
 
             elif pair[0] < min_buy_price:
-                skip_shares += pair
+                skip_shares.append_pair(pair[0], pair[1])
                 remaining_shares.pairs = remaining_shares.pairs[1:]
                 continue
 
@@ -125,7 +125,7 @@ def distribute_pass(shares: Shares, targets: List[Target], current_price: Decima
                 taken_shares = [chosen_pair[0], n_shares]
                 remaining_shares -= taken_shares
                 assignment.profit += profit
-                assignment.shares += taken_shares
+                assignment.shares.append_pair(chosen_pair[0], n_shares)
             elif n_shares == 0:
                 print("Error diagnostics:")
                 print("  Chosen Pair:", chosen_pair)
@@ -5,6 +5,8 @@ from serialize_context import SerializeContext
 class HistoryItem:
     ''' Describes an action in the history of an asset. '''
 
+    __slots__ = ("time", "description", "physical_shares")
+
     def __init__(self, time: datetime, description: str, physical_shares: int):
         self.time = time
         self.description = description
@@ -20,5 +22,5 @@ class HistoryItem:
     def __repr__(self) -> str:
         return f"{self.time}: {self.description} ({self.physical_shares} shares after)"
 
-def new_history_item_from_dict(dict, context: SerializeContext) -> HistoryItem:
-    return HistoryItem(dict['time'], dict['description'], dict['physicalShares'])
\ No newline at end of file
+def new_history_item_from_dict(d, context: SerializeContext) -> HistoryItem:
+    return HistoryItem(d['time'], d['description'], d['physicalShares'])
\ No newline at end of file
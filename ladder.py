@@ -10,6 +10,9 @@ from target import Target, new_target_from_dict
 class RungDef:
     ''' Template that defines how to generate a ladder rung. '''
 
+    __slots__ = ("sell_times", "profit", "min_share_profit_ratio",
+        "min_profit", "disable_trend_threshold", "disable_days")
+
     def __init__(self, sell_times: Decimal, profit: Decimal,
             min_share_profit_ratio: Decimal, min_profit: Decimal = None,
             disable_trend_threshold: Decimal = None,
@@ -66,6 +69,9 @@ class RungDef:
 class Rung:
     ''' A rung in the Ladder. '''
 
+    __slots__ = ("definition", "target", "start_price", "lowest_price",
+        "disabled")
+
     def __init__(self, definition: RungDef, target: Target, 
             start_price: Decimal, disabled: bool):
         self.definition = definition
@@ -111,9 +117,13 @@ class Ladder(StageBase):
         that even as the price lowers, the target horizon remains at the same
         price, with new rungs generated to fill the space in between.
         '''
+
+    __slots__ = ("rung_defs", "def_to_rungs", "horizon", "rung_frequency",
+        "min_trend_point", "max_trend_point", "paused")
     
     def __init__(self, defs, def_to_rungs, rung_frequency, min_trend_point=None,
                 max_trend_point=None, paused=False):
+        super().__init__("ladder")
         self.rung_defs = defs
         self.def_to_rungs = def_to_rungs
         self.horizon = None
@@ -295,9 +305,6 @@ class Ladder(StageBase):
                 if rung.target.horizon_request_id == id:
                     rung.target.horizon_request_id = None
 
-    def get_stage_kind(self) -> str:
-        return "ladder"
-    
     def get_highest_ready_price(self) -> Decimal:
         ''' Gets the highest supported price where any rungs on the horizon
             will already be paid up to that point. '''
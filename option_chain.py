@@ -223,15 +223,15 @@ def new_unborrow_event(underlying, old_strike, old_price,
     return OptionHistoryItem(f"[${underlying:.2f}] UNBORROW {n_borrows} shares; {old_label} -> {new_label}", net_change)
 
 
-def new_option_from_dict(dict, asset, context: SerializeContext) -> OptionChain:
+def new_option_from_dict(d, asset, context: SerializeContext) -> OptionChain:
     ''' Creates a new asset from the given dictionary. '''
 
-    mode = dict['mode']
-    strike = dict['strike']
-    price = Decimal(dict['price'])
-    n_borrows = dict["nBorrows"]
-    n_contracts = dict['nContracts']
-    active = dict['active']
-    history = [OptionHistoryItem(event["description"], event["value"]) for event in dict['history']]
+    mode = d['mode']
+    strike = d['strike']
+    price = Decimal(d['price'])
+    n_borrows = d["nBorrows"]
+    n_contracts = d['nContracts']
+    active = d['active']
+    history = [OptionHistoryItem(event["description"], event["value"]) for event in d['history']]
     o = OptionChain(asset, mode, strike, price, n_borrows, n_contracts, active, history)
     return o
\ No newline at end of file
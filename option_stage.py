@@ -25,6 +25,8 @@ UPGRADE_TAX_RATE = 0.1
 class OptionTarget:
     ''' Tracks an option and its corresponding target. '''
 
+    __slots__ = ("option", "targets", "profit_level")
+
     def __init__(self, option: Option, targets=[], profit_level=None):
         self.option = option
         self.targets = targets
@@ -45,18 +47,17 @@ class OptionTarget:
 
 class OptionStage(StageBase):
     '''  A stage where targets can be manually created. '''
-    pass
+
+    __slots__ = ("asset", "o_targets")
 
     def __init__(self, asset=None, o_targets=None):
+        super().__init__("option")
         self.asset = asset
         if o_targets is None:
             self.o_targets = []
         else:
             self.o_targets = o_targets
 
-    def get_stage_kind(self) -> str:
-        return "option"
-
     def __repr__(self) -> str:
         targetReports = []
         for t in self.o_targets:
@@ -86,7 +87,7 @@ class OptionStage(StageBase):
         report = self.asset.distribute()
         
         assignment = report.target_to_assignment[target_to_sell]
-        shares = assignment.shares.as_split([self.asset.price])[0]
+        shares = assignment.shares.below(self.asset.price)
         self.asset.shares[1] -= shares
 
         profit = assignment.shares.compute_profit(self.asset.price)
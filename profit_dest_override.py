@@ -3,6 +3,8 @@ from decimal import Decimal
 
 
 class ProfitDestOverride:
+    __slots__ = ("dest", "value")
+
     def __init__(self, dest, value):
         self.dest = dest
         self.value = value
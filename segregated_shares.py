@@ -11,15 +11,14 @@ class SegregatedShares(BaseShares):
         receives any added shares.
     '''
 
+    __slots__ = ("groups",)
+
     def __init__(self, groups: List[Shares]):
         self.groups = groups
 
     def total_buy_cost(self):
         ''' Compute total money paid to own all current shares. '''
-        value = 0
-        for group in self.groups:
-            value += group.total_buy_cost()
-        return value
+        return sum(group.total_buy_cost() for group in self.groups)
 
     def to_pairs(self, clone=True) -> Shares:
         ''' Gets all shares in this collection. 
@@ -42,10 +41,8 @@ class SegregatedShares(BaseShares):
     def __len__(self) -> int:
         ''' Gets the number of shares in this. '''
 
-        n_shares = 0
-        for group in self.groups:
-            n_shares += len(group)
-        return n_shares
+        # Each group caches its own count, so this is a sum of a few ints.
+        return sum(len(group) for group in self.groups)
     
     def __repr__(self) -> str:
         return str(self.groups)
@@ -60,11 +57,18 @@ class SegregatedShares(BaseShares):
 
         self.groups[index] = new_group
 
+    def transfer(self, src_index, dst_index, shares):
+        ''' Move the given shares from one group to another in-place. The 
+            source group must contain all of them. '''
+
+        self.groups[src_index] -= shares
+        self.groups[dst_index] += shares
+
 
-def new_segregated_shares_from_dict(dict) -> SegregatedShares:
+def new_segregated_shares_from_dict(d) -> SegregatedShares:
     ''' Creates a SegregatedShares from the given dictionary. '''
 
-    groups = [new_shares_from_dict(g) for g in dict]
+    groups = [new_shares_from_dict(g) for g in d]
     return SegregatedShares(groups)
 
 
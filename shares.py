@@ -1,7 +1,8 @@
+from bisect import bisect_right
 from math import ceil
+from operator import itemgetter
 from decimal import Decimal
 from typing import List
-from copy import deepcopy
 import util
 import sys
 from serialize_context import SerializeContext
@@ -13,12 +14,17 @@ else:
     from typing_extensions import Self
 
 
+# Smallest price increment that shares are tracked at.
+PENNY = Decimal("0.01")
+HALF_PENNY = PENNY / 2
+
+
 class BaseShares:
     ''' Base Shares interface. A class that extends this should provide basic
          Share manipulation and retrieval. 
     '''
     
-    pass
+    __slots__ = ()
 
 
 class Shares(BaseShares):
@@ -29,22 +35,32 @@ class Shares(BaseShares):
         is.
     '''
 
+    __slots__ = ("_pairs", "_n_total")
+
     def __init__(self, pairs=None, no_convert=False):
         if pairs is not None:
             self.pairs = pairs if no_convert else convert_to_pairs(pairs)
         else:
             self.pairs = []
 
+    @property
+    def pairs(self):
+        return self._pairs
+
+    @pairs.setter
+    def pairs(self, pairs):
+        self._pairs = pairs
+
+        # Cached total number of shares, maintained by the mutators below.
+        self._n_total = sum(qty for (_, qty) in pairs)
+
     def value(self, price: Decimal) -> Decimal:
         ''' Gets the total value of all Shares at the given price. '''
         return price * len(self)
 
     def total_buy_cost(self) -> Decimal:
         ''' Gets the total amount of money paid to purchase all current shares. '''
-        total_value = Decimal(0)
-        for pair in self.pairs:
-            total_value += pair[0] * pair[1]
-        return total_value
+        return sum((price * qty for (price, qty) in self.pairs), Decimal(0))
 
     def to_dict(self, context: SerializeContext):
         ''' Converts this Shares into a dictionary for serialization. '''
@@ -57,7 +73,7 @@ class Shares(BaseShares):
     def to_pairs(self, clone=True):
         ''' Converts this Shares into raw pairs and optionally clones them. '''
         if clone:
-            return deepcopy(self.pairs)
+            return clone_pairs(self.pairs)
         else:
             return self.pairs
 
@@ -67,6 +83,31 @@ class Shares(BaseShares):
         extracted_pairs = first_shares(reversed(self.pairs), n)
         return Shares(extracted_pairs)
     
+    def below(self, max_price) -> Self:
+        ''' Gets the shares priced at or below max_price. Same as the first
+            group of as_split([max_price]) without building the other. '''
+
+        below = self.pairs[:bisect_right(self.pairs, max_price, key=itemgetter(0))]
+        return Shares(clone_pairs(below), no_convert=True)
+
+    def n_below(self, max_price) -> int:
+        ''' Counts the shares priced at or below max_price without building a
+            new Shares. '''
+
+        end = bisect_right(self.pairs, max_price, key=itemgetter(0))
+        return sum(qty for (_, qty) in self.pairs[:end])
+
+    def top_below(self, max_price, n, clamp=False) -> Self:
+        ''' Gets the top n shares priced at or below max_price. If clamp is
+            set, this takes all such shares when there are fewer than n. '''
+
+        below = self.pairs[:bisect_right(self.pairs, max_price, key=itemgetter(0))]
+        if clamp:
+            n = min(n, sum(qty for (_, qty) in below))
+
+        extracted_pairs = first_shares(reversed(below), n)
+        return Shares(extracted_pairs)
+
     def slice(self, n_start, n_end) -> Self:
         ''' Slice shares based on lowest to highest cost. This will return
             (n_end - n_start) shares. '''
@@ -86,28 +127,13 @@ class Shares(BaseShares):
         if len(price_levels) == 0:
             return [self.clone()]
 
-        split_points = sorted(price_levels)
-        groups = []
-
-        current_group = Shares()
-        current_upper = split_points[0]
-        split_points = split_points[1:]
-        for pair in self.pairs:
-
-            while current_upper is not None and pair[0] > current_upper:
-                current_upper = split_points[0] if len(split_points) > 0 else None
-                split_points = split_points[1:]
-                groups.append(current_group)
-                current_group = Shares()
-
-            current_group.pairs.append([pair[0], pair[1]])
-
-        groups.append(current_group)
-        if len(groups) < len(price_levels) + 1:
-            n_missing_groups = len(price_levels) + 1 - len(groups)
-            groups += [Shares() for i in range(0, n_missing_groups)]
-
-        return groups
+        # Pairs are sorted, so each split point is a cut into the pair list.
+        cuts = [bisect_right(self.pairs, split_point, key=itemgetter(0))
+                for split_point in sorted(price_levels)]
+        starts = [0] + cuts
+        ends = cuts + [len(self.pairs)]
+        return [Shares(clone_pairs(self.pairs[start:end]), no_convert=True)
+                for (start, end) in zip(starts, ends)]
 
     def set(self, other):
         ''' Assigns the given shares to this in-place. other will be cloned.
@@ -122,6 +148,7 @@ class Shares(BaseShares):
 
         pair = get_pair(self.pairs, price)
         if pair is not None:
+            self._n_total += quantity - pair[1]
             if quantity != 0:
                 pair[1] = quantity
             else:
@@ -148,9 +175,9 @@ class Shares(BaseShares):
     def shift_prices(self, d_price: Decimal):
         ''' Shifts the prices of all shares by the given delta. '''
 
+        d_price = Decimal(d_price)
         for pair in self.pairs:
-            pair[0] += Decimal(d_price)
-        self.sort()
+            pair[0] += d_price
 
     def shift_bottom(self, d_price: Decimal, n_bottom: int):
         x = self.bottom(n_bottom)
@@ -167,51 +194,47 @@ class Shares(BaseShares):
     def scale_prices(self, f_price: Decimal):
         ''' Scales the prices of all shares by the given factor. '''
 
+        f_price = Decimal(f_price)
         for pair in self.pairs:
-            pair[0] *= Decimal(f_price)
-        self.sort()
+            pair[0] *= f_price
+
+        # A negative factor is the only way scaling can change the order.
+        if f_price < 0:
+            self.pairs.reverse()
 
     def scale_quantities(self, f_qty: float):
         ''' Scales the number of shares by the given factor. Note that 
             reverse-splits can cause rounding errors. '''
 
-        for pair in self.pairs:
-            pair[1]  = int(round(pair[1] * f_qty))
-        self.sort()
+        self.pairs = [[price, int(round(qty * f_qty))] for (price, qty) in self.pairs]
 
     def distribute_value(self, amount: Decimal):
         ''' Distribute value evenly to the shares. '''
 
-        per_share = Decimal(amount) / n_shares
         n_shares = len(self)
+        per_share = Decimal(amount) / n_shares
         for pair in self.pairs:
             pair[0] += per_share
 
     def clone(self) -> Self:
         ''' Clones this Shares. '''
-        return Shares(deepcopy(self.pairs), no_convert=True)
+        return Shares(clone_pairs(self.pairs), no_convert=True)
 
     def validate(self):
         for pair in self.pairs:
             if pair[1] == 0:
                 raise Exception(f"Contains pair with 0 shares: {pair}")
 
+        n_total = sum(qty for (_, qty) in self.pairs)
+        if self._n_total != n_total:
+            raise Exception(f"Cached share count {self._n_total} != {n_total}")
+
     def __len__(self) -> int:
         ''' Gets the number of shares in this. '''
-        n_shares = 0
-        for pairs in self.pairs:
-            n_shares += pairs[1]
-        return n_shares
+        return self._n_total
     
     def __str__(self) -> str:
-        text = "["
-        for (i, pair) in enumerate(self.pairs):
-            text += f"${pair[0]:.2f} x {int(pair[1])}"
-            if i < len(self.pairs) - 1:
-                text += ", "
-    
-        text += "]"
-        return text
+        return "[" + ", ".join(f"${price:.2f} x {int(qty)}" for (price, qty) in self.pairs) + "]"
         
     def __repr__(self) -> str:
         return self.__str__()
@@ -222,10 +245,29 @@ class Shares(BaseShares):
         result = self.clone()
         return result.__iadd__(other_in)
     
+    def append_pair(self, price, qty):
+        ''' Adds qty shares at price, penny-rounded as += would. Adding at or 
+            above the highest price is a plain append; anything else is 
+            merged. '''
+
+        if qty <= 0:
+            raise Exception(f"Pair contains 0/negative shares: {(price, qty)}")
+
+        price = Decimal(util.penny_round(price))
+        pairs = self.pairs
+        if len(pairs) == 0 or pairs[-1][0] < price:
+            pairs.append([price, qty])
+        elif pairs[-1][0] == price:
+            pairs[-1][1] += qty
+        else:
+            merge_pairs(pairs, [[price, qty]])
+        self._n_total += qty
+
     def __iadd__(self, other_in) -> Self:
         ''' Adds the given other shares to this to create a new Shares. '''
 
         other_pairs = convert_to_pairs(other_in)
+        self._n_total += sum(qty for (_, qty) in other_pairs)
         merge_pairs(self.pairs, other_pairs)
         return self
     
@@ -239,10 +281,23 @@ class Shares(BaseShares):
         return result.__isub__(other_in)
     
     def __isub__(self, other_in) -> Self:
-        ''' Subtract other from this. '''
+        ''' Subtract other from this. 
 
-        other_pairs = convert_to_pairs(other_in)
+            Held pairs are matched with get_pair, so a price that is not a
+            whole penny (e.g. after distribute_value or shift_prices) matches
+            a removed price less than half a penny away: 1.004 matches 1.00 
+            and 1.006 matches 1.01. If two held prices are that close, the 
+            lower one is used.
+        '''
+
+        # Subtraction only reads the other pairs, so another Shares needs no
+        # clone.
+        if type(other_in) is Shares and other_in is not self:
+            other_pairs = other_in.pairs
+        else:
+            other_pairs = convert_to_pairs(other_in)
 
+        emptied = False
         for pair in other_pairs:
             existing_pair = get_pair(self.pairs, pair[0])
             if existing_pair is None:
@@ -251,8 +306,13 @@ class Shares(BaseShares):
                 raise Exception(f"Insufficient shares: {existing_pair[1]} - {pair[1]}")
             
             existing_pair[1] -= pair[1]
+            self._n_total -= pair[1]
+            emptied = emptied or existing_pair[1] == 0
 
-        prune_zeros(self.pairs)
+        # get_pair bisects, so only pay for a pass over the pairs if one of 
+        # them has to go.
+        if emptied:
+            prune_zeros(self.pairs)
         return self
 
     def top_profit(self, profit: Decimal, sell_price: Decimal, 
@@ -264,14 +324,12 @@ class Shares(BaseShares):
             Returns (Shares, profit).    
         '''
         
-        pairs_remaining = self.pairs[:]
         extracted_pairs = []
         accum_profit = 0
-        while len(pairs_remaining) > 0:
+        for pair in reversed(self.pairs):
             if profit <= accum_profit:
                 break
 
-            pair = pairs_remaining.pop(-1)
             n_to_take, pair_profit = pair_n_needed_for_profit(pair, 
                 profit - accum_profit, sell_price, min_buy_price, min_margin)
             accum_profit += pair_profit
@@ -283,12 +341,12 @@ class Shares(BaseShares):
             min_margin: Decimal=Decimal(1.0)) -> Decimal:
         ''' Computes the profit from selling these shares at the given price.
         '''
-        accum_profit = 0
-        for pair in self.pairs:
-            adjusted_buy_price = min(pair[0], sell_price / min_margin)
-            profit_per_share = sell_price - max(adjusted_buy_price, min_buy_price)
-            accum_profit += profit_per_share * pair[1]
-        return accum_profit
+
+        # Highest buy price that still gets credit for the minimum margin. This
+        # is the same for every pair, so only divide once.
+        max_adjusted_price = sell_price / min_margin
+        return sum((sell_price - max(min(price, max_adjusted_price), min_buy_price)) * qty
+                for (price, qty) in self.pairs)
 
 
 def remove_pair(pairs, price):
@@ -302,27 +360,31 @@ def remove_pair(pairs, price):
 
 def merge_pairs(existing_pairs, new_pairs):
     ''' Merge new_pairs into existing_pairs in-place. Assumes that both inputs
-        are correctly constructed pairs. '''
-
-    for new_pair in new_pairs:
-
-        found = False
-        for existing_pair in existing_pairs:
-            if new_pair[0] == existing_pair[0]:
-                existing_pair[1] += new_pair[1]
-                found = True
-                break
+        are correctly constructed pairs. The pairs in new_pairs are not 
+        modified. '''
+
+    # Both lists are sorted runs, so this sort is a single linear merge. It is
+    # stable, so existing pairs come before new pairs of the same price and
+    # absorb them below.
+    combined = existing_pairs + new_pairs
+    sort_pairs(combined)
+
+    merged = []
+    for pair in combined:
+        if len(merged) > 0 and merged[-1][0] == pair[0]:
+            # Replace rather than add in place, since the pair being added to
+            # may belong to new_pairs.
+            merged[-1] = [pair[0], merged[-1][1] + pair[1]]
+        else:
+            merged.append(pair)
 
-        if not found:
-            existing_pairs.append(new_pair)
-    
-    sort_pairs(existing_pairs)
+    existing_pairs[:] = merged
 
 
-def new_shares_from_dict(dict):
+def new_shares_from_dict(d):
     ''' Loads a Shares object from the given dict. '''
 
-    raw_pairs = dict
+    raw_pairs = d
     pairs = []
     for pair in raw_pairs:
         price = pair[0]
@@ -348,12 +410,12 @@ def convert_to_pairs(in_stuff):
 
     if isinstance(in_stuff, BaseShares):
         return in_stuff.to_pairs(clone=True)
-    elif isinstance(in_stuff, list):
+    elif type(in_stuff) is list:
         if len(in_stuff) == 0:
             return []
         elif isinstance(in_stuff[0], Shares):
             raise Exception("Given list containing Shares object")
-        elif isinstance(in_stuff[0], list) or isinstance(in_stuff[0], tuple):
+        elif type(in_stuff[0]) is list or type(in_stuff[0]) is tuple:
             return fixup_list(in_stuff)
         else:
 
@@ -363,12 +425,19 @@ def convert_to_pairs(in_stuff):
                 return [fixup_pair(in_stuff)]
             else:
                 return []
-    elif isinstance(in_stuff, tuple):
-        return [deepcopy(fixup_pair(in_stuff))] 
+    elif type(in_stuff) is tuple:
+        return [fixup_pair(in_stuff)]
     else:
         raise Exception("Unknown shares format.")
     
 
+def clone_pairs(pairs):
+    ''' Clones the given pairs. Prices and quantities are immutable, so only
+        the pair lists themselves need copying. '''
+
+    return [[price, qty] for (price, qty) in pairs]
+
+
 def sort_pairs(pairs):
     ''' Sorts the given pairs. 
       
@@ -376,26 +445,27 @@ def sort_pairs(pairs):
         after an operation temporarily breaks it. In-place.
     '''
 
-    pairs.sort(key=lambda p: p[0])
+    pairs.sort(key=itemgetter(0))
 
 
 def prune_zeros(pairs):
     ''' Prunes out pairs that have zero shares. In-place. '''
     
-    def f(p) -> bool:
+    for p in pairs:
         if p[1] < 0:
             raise Exception(f"Pair has negative quantity: {p[1]} @ ${p[0]}")
-        return p[1] > 0
 
-    pairs[:] = [p for p in pairs if f(p)]
+    pairs[:] = [p for p in pairs if p[1] > 0]
 
 
 def get_pair(pairs, price):
-    ''' Extracts the given pair by price from the given set of pairs. '''
+    ''' Extracts the given pair by price from the given sorted pairs. Prices
+        within half a penny of the given price match. '''
 
-    for pair in pairs:
-        if abs(pair[0] - price) < 0.005:
-            return pair
+    price = Decimal(price)
+    i = bisect_right(pairs, price - HALF_PENNY, key=itemgetter(0))
+    if i < len(pairs) and pairs[i][0] - price < HALF_PENNY:
+        return pairs[i]
     return None
 
 
@@ -451,4 +521,56 @@ def pair_n_needed_for_profit(pair, profit: Decimal, sell_price: Decimal,
     n_sold_shares = min(int(ceil(profit / profit_per_share)), pair[1])
     return n_sold_shares, profit_per_share * n_sold_shares
 
-    
+
+if __name__ == '__main__':
+    def expect(expected, actual):
+        if actual != expected:
+            raise Exception(f"Failed: {expected} != {actual}")
+
+    shares = Shares([[10, 3], [20, 1]])
+    shares.distribute_value(Decimal(2))
+    expect([[Decimal("10.5"), 3], [Decimal("20.5"), 1]], shares.pairs)
+    expect(Decimal(52), shares.total_buy_cost())
+
+    expect(3, shares.n_below(Decimal("10.5")))
+    expect(len(shares.below(20)), shares.n_below(20))
+
+    # Held prices that are not whole pennies match the penny they round to.
+    shares = Shares([[1, 2], [2, 3]])
+    shares.shift_prices(Decimal("0.004"))
+    shares -= [[1, 1]]
+    expect([[Decimal("1.004"), 1], [Decimal("2.004"), 3]], shares.pairs)
+    shares.shift_prices(Decimal("0.002"))
+    shares -= [[Decimal("2.01"), 3]]
+    expect([[Decimal("1.006"), 1]], shares.pairs)
+    expect(1, len(shares))
+
+    # Pairs of the same price within one operand are merged and counted once.
+    shares = Shares()
+    shares += [[Decimal("1.004"), 1], [Decimal("1.003"), 2]]
+    expect([[Decimal("1.00"), 3]], shares.pairs)
+    expect(3, len(shares))
+    other = Shares([[2, 1], [2, 1]])
+    shares = Shares([[5, 1]]) + other
+    expect([[Decimal("2.00"), 2], [Decimal("5.00"), 1]], shares.pairs)
+    expect(3, len(shares))
+    expect([[Decimal("2.00"), 1], [Decimal("2.00"), 1]], other.pairs)
+    shares.validate()
+
+    # get_pair bisects the sorted pairs and matches within half a penny.
+    pairs = Shares([[1, 1], [Decimal("1.01"), 2], [3, 1]]).pairs
+    expect(pairs[0], get_pair(pairs, Decimal("1.004")))
+    expect(pairs[1], get_pair(pairs, Decimal("1.006")))
+    expect(None, get_pair(pairs, Decimal("1.016")))
+    expect(None, get_pair(pairs, Decimal("0.99")))
+    expect(pairs[2], get_pair(pairs, 3))
+    expect(None, get_pair(pairs, 4))
+    expect(None, get_pair([], 1))
+
+    # append_pair rounds prices to the penny like +=.
+    shares = Shares()
+    shares.append_pair(Decimal("1.004"), 1)
+    shares.append_pair(Decimal("1.001"), 2)
+    shares.append_pair(Decimal("0.996"), 1)
+    expect(Shares([[1, 4]]).pairs, shares.pairs)
+    expect(4, len(shares))
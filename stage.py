@@ -1,5 +1,10 @@
 class StageBase:
     ''' Base class for an Asset strategy stage. '''
 
+    __slots__ = ("stage_kind",)
+
     def __init__(self, stage_kind):
-        self.stage_kind = stage_kind
\ No newline at end of file
+        self.stage_kind = stage_kind
+
+    def get_stage_kind(self) -> str:
+        return self.stage_kind
\ No newline at end of file
@@ -8,6 +8,9 @@ class Target:
         much profit it should seek to make.
     '''
 
+    __slots__ = ("name", "profit", "sell_price", "max_buy_price",
+        "min_buy_price", "horizon_request_id")
+
     def __init__(self, name: str, profit: Decimal, sell_price: Decimal, 
             max_buy_price: Decimal, min_buy_price: Decimal,
             horizon_request_id = None):
@@ -59,16 +62,16 @@ class Target:
             f"minBuyPrice: {self.min_buy_price:.2f}]" +
             f"horizonFundID: {self.horizon_request_id}]")
 
-def new_target_from_dict(dict, context: SerializeContext) -> Target:
+def new_target_from_dict(d, context: SerializeContext) -> Target:
     ''' Loads a Target from the given dict. '''
 
-    id = dict["id"]
-    name = dict["name"]
-    profit = Decimal(dict["profit"])
-    sell_price = Decimal(dict["sell_price"])
-    max_buy_price = Decimal(dict["max_buy_price"])
-    min_buy_price = Decimal(dict["min_buy_price"])
-    horizon_request_id = dict.get("horizon_request_id", None)
+    id = d["id"]
+    name = d["name"]
+    profit = Decimal(d["profit"])
+    sell_price = Decimal(d["sell_price"])
+    max_buy_price = Decimal(d["max_buy_price"])
+    min_buy_price = Decimal(d["min_buy_price"])
+    horizon_request_id = d.get("horizon_request_id", None)
 
     target = Target(name, profit, sell_price, max_buy_price, min_buy_price,
             horizon_request_id=horizon_request_id)
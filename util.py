@@ -64,6 +64,15 @@ def decimal_get(dic, key, default_value):
 		return Decimal(value)
 	else:
 		return value
+
+
+def decimal_currency_collection(raw_collection):
+	''' Casts every amount in the given raw currency collection to Decimal. '''
+
+	return {
+		currency_kind: Decimal(amount)
+		for (currency_kind, amount) in raw_collection.items()
+	}
 	
 
 def to_dict(x, context: SerializeContext):
@@ -76,6 +85,11 @@ def to_dict(x, context: SerializeContext):
 
 
 def penny_round(x, fn=round):
+
+	# Plain floats are the most common input, so check for them first.
+	if type(x) is float:
+		return fn(x * 100) / 100
+
 	if isinstance(x, tuple):
 		new_list = []
 		for item in x: